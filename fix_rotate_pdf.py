@@ -1,53 +1,427 @@
+import hashlib
+import json
+import math
+import os
+import sys
+import tempfile
+from datetime import datetime
 from pathlib import Path
-from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from itertools import repeat
 
 import numpy as np
+from PIL import Image
+
+# Tesseract の OpenMP マルチスレッドは OSD のような小さな処理ではかえって遅くなるため、
+# pytesseract から起動する全ての tesseract プロセスを 1 スレッドに制限する（import 前に設定）
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 
 import pikepdf
 from pdf2image import convert_from_path
 import pytesseract
-import tkinter as tk
-from tkinter import filedialog
 
 DEFAULT_CONF_THRESHOLD = 5.0   # 漫画向けに低め。まずはこのくらいから
-DEFAULT_DPI = 200              # 低すぎるとOSD精度が落ちやすい
+DEFAULT_DPI = 200              # 文字数カウント用。低すぎると日本語の文字認識精度が落ちやすい
+DEFAULT_OSD_DPI = 100          # 向き判定(OSD/姿勢推定)用のラスタライズ解像度。向きだけなら低解像度で足りる
+DEFAULT_OSD_MAX_SIDE = 1200    # OSD に渡す画像の長辺上限(px)
 
 # 実行時に入力で上書きされる値
 CONF_THRESHOLD = DEFAULT_CONF_THRESHOLD
 DPI = DEFAULT_DPI
+OSD_DPI = DEFAULT_OSD_DPI
+OSD_MAX_SIDE = DEFAULT_OSD_MAX_SIDE
+
+# OCR を並列実行するワーカープロセス数。ワーカーごとに Tesseract の言語モデル（jpn+jpn_vert+eng）と
+# mediapipe の Pose を常駐させるため、コア数が多くてもメモリ使用量を抑えるよう 4 で頭打ちにする
+OCR_WORKERS = min(os.cpu_count() or 1, 4)
+# ラスタライズ結果は JPEG で受け取る（PPM より大幅に小さく、この品質なら OSD 精度に影響しない）
+RASTER_JPEG_QUALITY = 85
+# 一時ファイルは一度読むだけなので、プログレッシブ化・ハフマン最適化のエンコード時間はかけない
+RASTER_JPEG_OPTIONS = {"quality": RASTER_JPEG_QUALITY, "progressive": False, "optimize": False}
+
+
+def _as_rgb(img):
+    """Return ``img`` in RGB mode, without copying when it already is RGB."""
+
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+
+def _downscale_for_osd(img, max_side=None):
+    """Shrink ``img`` so that its long side is at most ``max_side`` pixels.
+
+    Tesseract's OSD cost grows with the pixel count while orientation accuracy
+    saturates well below the rasterization DPI. Only the copy handed to OSD is
+    resized; the PDF itself is never re-encoded. The copy's ``dpi`` metadata
+    is scaled along with it so Tesseract sees the true text size.
+    """
+
+    if max_side is None:
+        max_side = OSD_MAX_SIDE
+    long_side = max(img.size)
+    if max_side <= 0 or long_side <= max_side:
+        return img
+
+    scale = max_side / long_side
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    small = img.resize(size, Image.BILINEAR)
+    x_dpi, y_dpi = img.info.get("dpi", (OSD_DPI, OSD_DPI))
+    small.info["dpi"] = (max(1, round(x_dpi * scale)), max(1, round(y_dpi * scale)))
+    return small
+
+
+# OSD 前に余白を切り落とす際、この値未満の画素を「インクあり」とみなす
+OSD_CROP_INK_LEVEL = 200
+# 切り落としで面積がこの割合以上減るときだけ切り抜く（わずかな差ならコピーの方が高くつく）
+OSD_CROP_MIN_SAVING = 0.1
+# 切り抜き範囲の外側に残す余白（px）。文字の端が欠けると OSD が不安定になる
+OSD_CROP_MARGIN = 8
+# グレースケール値 → インクなら 255・余白なら 0 の変換表（二値化と範囲検出を PIL の C 実装だけで済ませる）
+_INK_LUT = [255 if level < OSD_CROP_INK_LEVEL else 0 for level in range(256)]
+
+
+def _crop_to_ink(img):
+    """Crop ``img`` to the bounding box of its dark pixels, plus a small margin.
+
+    Blank margins only add work to Tesseract's layout analysis. The image is
+    returned unchanged when it has no ink or the crop would save little.
+    """
+
+    ink_box = img.convert("L").point(_INK_LUT).getbbox()
+    if ink_box is None:
+        return img
+
+    left, top, right, bottom = ink_box
+    box = (
+        max(0, left - OSD_CROP_MARGIN),
+        max(0, top - OSD_CROP_MARGIN),
+        min(img.width, right + OSD_CROP_MARGIN),
+        min(img.height, bottom + OSD_CROP_MARGIN),
+    )
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    if area > (1 - OSD_CROP_MIN_SAVING) * img.width * img.height:
+        return img
+
+    cropped = img.crop(box)
+    cropped.info = dict(img.info)
+    return cropped
+
+
+def _image_dpi(img):
+    """Return the horizontal DPI recorded on ``img`` as an int, or ``None``."""
+
+    dpi = img.info.get("dpi")
+    return max(1, round(dpi[0])) if dpi else None
+
+
+# tesserocr は任意依存。入っていれば OSD をページごとの tesseract サブプロセスではなく、
+# プロセス内に常駐させた API で実行する（モデル読み込みと画像の書き出しがページごとに発生しない）
+_TESS_OSD_API = None
+_TESSEROCR_MISSING = False
+
+# OSD は osd.traineddata だけで動くため、言語モデル（eng など）を読み込ませないよう明示する
+OSD_LANG = "osd"
+# 白黒反転画像での再試行は不要（スキャン・漫画とも地は白）
+OSD_VARIABLES = {"tessedit_do_invert": "0"}
+
+
+def _get_osd_api():
+    """Return the process-wide tesserocr OSD API, or ``None`` if unavailable."""
+
+    global _TESS_OSD_API, _TESSEROCR_MISSING
+    if _TESS_OSD_API is None and not _TESSEROCR_MISSING:
+        try:
+            import tesserocr  # type: ignore
+
+            _TESS_OSD_API = tesserocr.PyTessBaseAPI(
+                lang=OSD_LANG,
+                psm=tesserocr.PSM.OSD_ONLY,
+                variables=OSD_VARIABLES,
+            )
+        except (ImportError, RuntimeError):
+            # 未インストール、または osd.traineddata が見つからない場合は pytesseract を使う
+            _TESSEROCR_MISSING = True
+    return _TESS_OSD_API
+
+
+# 文字数カウント用の認識 API も同様に常駐させる（jpn+jpn_vert+eng のモデル読み込みが特に重い）
+_TESS_TEXT_API = None
+_TESS_TEXT_MISSING = False
+
+
+def _get_text_api():
+    """Return the process-wide tesserocr text recognition API, or ``None`` if unavailable."""
+
+    global _TESS_TEXT_API, _TESS_TEXT_MISSING
+    if _TESS_TEXT_API is None and not _TESS_TEXT_MISSING:
+        try:
+            import tesserocr  # type: ignore
+
+            _TESS_TEXT_API = tesserocr.PyTessBaseAPI(lang="jpn+jpn_vert+eng")
+        except (ImportError, RuntimeError):
+            # 未インストール、または学習データが揃っていない場合は pytesseract を使う
+            _TESS_TEXT_MISSING = True
+    return _TESS_TEXT_API
+
+
+def _set_tesserocr_image(api, pil_img):
+    """Hand an RGB image to tesserocr without going through an encoded file."""
+
+    api.SetImageBytes(pil_img.tobytes(), pil_img.width, pil_img.height, 3, 3 * pil_img.width)
+    dpi = _image_dpi(pil_img)
+    if dpi:
+        api.SetSourceResolution(dpi)
+
+
+def _run_osd_tesserocr(api, pil_img) -> dict:
+    """Run OSD through tesserocr and return it in pytesseract's dict layout."""
+
+    _set_tesserocr_image(api, pil_img)
+    result = api.DetectOrientationScript()
+    if not result:
+        _OSD_FAILURES.append("orientation could not be detected")
+        return {}
+
+    orientation = result["orient_deg"]
+    return {
+        "orientation": orientation,
+        # pytesseract の "Rotate" と同じく、正立させるのに必要な時計回りの回転角
+        "rotate": (360 - orientation) % 360,
+        "orientation_conf": result["orient_conf"],
+        "script": result["script_name"],
+        "script_conf": result["script_conf"],
+    }
+
+
+# OSD 結果のキャッシュ。扉絵・白紙・章扉など同じレイアウトのページや、同じ PDF の再実行では OCR を省略する
+OSD_CACHE_PATH = Path.home() / ".cache" / "pdf_rotate" / "osd.json"
+OSD_CACHE_MAX_ENTRIES = 100_000
+
+_OSD_CACHE: dict = {}
+# このプロセスで新たに得た結果（親プロセスに返してファイルへ保存する分）
+_OSD_CACHE_NEW: dict = {}
+_OSD_CACHE_LOADED = False
+
+# このプロセスで失敗した OSD の理由。ワーカーから標準出力へ直接書かず、親プロセスがまとめて表示する
+_OSD_FAILURES: list = []
+# 失敗をキャッシュしたキーごとの理由（同じ画像の別ページでも失敗を報告し直すため）
+_OSD_FAILURE_REASONS: dict = {}
+
 
+def _osd_cache_key(pil_img, lang) -> str:
+    """Hash a 32x32 grayscale thumbnail of ``pil_img`` plus the OSD settings."""
+
+    thumb = pil_img.resize((32, 32), Image.BILINEAR).convert("L")
+    digest = hashlib.blake2b(thumb.tobytes(), digest_size=8)
+    digest.update(f"{lang}|{pil_img.size}|{_image_dpi(pil_img)}".encode())
+    return digest.hexdigest()
+
+
+def _read_osd_cache_file() -> dict:
+    try:
+        with open(OSD_CACHE_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def load_osd_cache() -> None:
+    """Load the on-disk OSD cache into this process (once)."""
+
+    global _OSD_CACHE_LOADED
+    if not _OSD_CACHE_LOADED:
+        _OSD_CACHE.update(_read_osd_cache_file())
+        _OSD_CACHE_LOADED = True
+
+
+def _drain_new_osd_cache() -> dict:
+    """Return and forget the OSD results computed since the last call."""
+
+    entries = dict(_OSD_CACHE_NEW)
+    _OSD_CACHE_NEW.clear()
+    return entries
+
+
+def _drain_osd_failures() -> list:
+    """Return and forget the OSD failure reasons recorded since the last call."""
+
+    failures = list(_OSD_FAILURES)
+    _OSD_FAILURES.clear()
+    return failures
+
+
+def save_osd_cache(entries: dict) -> None:
+    """Merge ``entries`` into the on-disk OSD cache.
+
+    The file is re-read and replaced atomically so that concurrent file-level
+    workers at worst lose each other's newest entries, never the whole cache.
+    """
+
+    if not entries:
+        return
+
+    merged = _read_osd_cache_file()
+    merged.update(entries)
+    if len(merged) > OSD_CACHE_MAX_ENTRIES:
+        merged = dict(list(merged.items())[-OSD_CACHE_MAX_ENTRIES:])
+
+    tmp = OSD_CACHE_PATH.with_name(f"{OSD_CACHE_PATH.name}.{os.getpid()}.tmp")
+    try:
+        OSD_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(merged, f)
+        os.replace(tmp, OSD_CACHE_PATH)
+    except OSError as exc:
+        print(f"OSD キャッシュを保存できませんでした ({exc})")
+
+
+def run_osd(pil_img, lang=OSD_LANG) -> dict:
+    """Run Tesseract OSD and return its result dict (``{}`` if OSD failed).
+
+    Results are cached by a thumbnail hash, so repeated page layouts and
+    re-runs skip Tesseract. Failures are only remembered for this process,
+    and every page that hits one reports the failure again.
+    """
+
+    original = pil_img
+    pil_img = _crop_to_ink(_as_rgb(_downscale_for_osd(pil_img)))
+    # 手を加えていないディスク上の画像なら、そのパスを Tesseract に渡す
+    source_path = getattr(original, "filename", "") if pil_img is original else ""
+
+    key = _osd_cache_key(pil_img, lang)
+    cached = _OSD_CACHE.get(key)
+    if cached is not None:
+        if not cached:
+            _OSD_FAILURES.append(_OSD_FAILURE_REASONS[key])
+        return dict(cached)
+
+    failures_before = len(_OSD_FAILURES)
+    osd = _run_osd_uncached(pil_img, lang, source_path)
+    _OSD_CACHE[key] = osd
+    if osd:
+        _OSD_CACHE_NEW[key] = osd
+    else:
+        _OSD_FAILURE_REASONS[key] = _OSD_FAILURES[-1] if len(_OSD_FAILURES) > failures_before else "unknown error"
+    return osd
+
+
+def _run_osd_uncached(pil_img, lang, source_path="") -> dict:
+    """Run OSD on an already prepared image.
+
+    Uses the in-process tesserocr API when it is installed (always loaded
+    with ``OSD_LANG``) and pytesseract otherwise.
+    ``source_path`` is the file ``pil_img`` was read from unchanged, if any;
+    pytesseract is then given the path instead of re-encoding the image.
+    """
+
+    api = _get_osd_api()
+    if api is not None:
+        return _run_osd_tesserocr(api, pil_img)
+
+    # pytesseract は画像を一時ファイルに書き出す際に DPI 情報を落とすため、解像度は引数で渡す
+    # （渡さないと "Invalid resolution" として 70 dpi 扱いになり、縮小画像で OSD が失敗しやすい）
+    dpi = _image_dpi(pil_img)
+    config = " ".join(f"-c {name}={value}" for name, value in OSD_VARIABLES.items())
+    if dpi:
+        config += f" --dpi {dpi}"
+    # PIL 画像を渡すと pytesseract は PNG に書き出し直すため、元ファイルがあればそれを読ませる
+    image = source_path or pil_img
 
-def detect_rotation_osd(pil_img, lang="jpn+eng"):
     try:
         # Use dict output to avoid regex parsing and convert to RGB to ensure DPI metadata
         # script detection (OSD) works better with appropriate languages, though mostly script-independent
         # Note: If passing specific langs fails (legacy engine error), we fallback to default (usually 'osd' or 'eng')
         try:
             osd = pytesseract.image_to_osd(
-                pil_img.convert("RGB"),
+                image,
                 lang=lang,
+                config=config,
                 output_type=pytesseract.Output.DICT
             )
         except pytesseract.TesseractError as e:
             if "OSD requires a model" in str(e) or "detects only orientation" in str(e):
                 # Fallback: try without language argument (relies on default osd.traineddata)
                 osd = pytesseract.image_to_osd(
-                    pil_img.convert("RGB"),
+                    image,
+                    config=config,
                     output_type=pytesseract.Output.DICT
                 )
             else:
                 raise e
-
-        rot = int(osd.get("rotate", 0))
-        conf = float(osd.get("orientation_confidence", 0.0))
     except pytesseract.TesseractError as exc:
         # When Tesseract fails due to few characters or missing resolution, treat as unknown
-        print(f"Tesseract OSD failed ({exc}); using default rotation=0, conf=0")
-        rot, conf = 0, 0.0
+        _OSD_FAILURES.append(str(exc).strip())
+        osd = {}
+
+    return osd
+
 
+def rotation_from_osd(osd: dict):
+    """Extract ``(rotation, confidence)`` from a :func:`run_osd` result."""
+
+    # OSD 失敗時は {}（回転なし・信頼度 0 扱い）。成功時の値は pytesseract / tesserocr とも int と float で揃っている
+    if not osd:
+        return 0, 0.0
+    rot = osd["rotate"]
+    conf = osd["orientation_conf"]
     return rot, conf
 
 
+def detect_rotation_osd(pil_img, lang=OSD_LANG):
+    return rotation_from_osd(run_osd(pil_img, lang))
+
+
+# mediapipe は任意依存。import だけで数百 MB を読み込むため、姿勢判定が必要になった時点で初めて読み込む
+_mp = None
+_MP_MISSING = False
+
+# mediapipe の Pose はモデル読み込みが重いため、プロセスごとに 1 つだけ作って使い回す
+_POSE = None
+
+
+def _mediapipe():
+    """Import mediapipe on first use and return the module.
+
+    mediapipe is an optional dependency: when it is not installed ``None`` is
+    returned (and the notice is printed only once per process), so pose-based
+    up/down detection is simply skipped.
+    """
+
+    global _mp, _MP_MISSING
+    if _mp is None and not _MP_MISSING:
+        try:
+            import mediapipe as mp_module  # type: ignore
+        except ImportError:
+            print("mediapipe が見つからなかったため、姿勢による上下判定はスキップします。")
+            _MP_MISSING = True
+        else:
+            _mp = mp_module
+    return _mp
+
+
+def _get_pose():
+    """Return the process-wide mediapipe Pose instance, creating it on first use.
+
+    The lite model (``model_complexity=0``) is enough because only the
+    vertical order of the nose and hips is used.
+    """
+
+    global _POSE
+    if _POSE is None:
+        _POSE = _mediapipe().solutions.pose.Pose(
+            static_image_mode=True,
+            enable_segmentation=False,
+            model_complexity=0,
+        )
+    return _POSE
+
+
+# 姿勢推定で上下が分かったときの信頼度。OSD の信頼度がこれを下回るときだけ姿勢推定の結果を採用する
+POSE_CONFIDENCE = 10.0
+
+
 def detect_pose_up_down(pil_img):
     """Use a pose-estimation model to infer whether the image is upside-down.
 
@@ -55,14 +429,12 @@ def detect_pose_up_down(pil_img):
     no pose is detected, ``(0, 0.0)`` is returned.
     """
 
-    try:
-        import mediapipe as mp  # type: ignore
-    except ImportError:
-        print("mediapipe が見つからなかったため、姿勢による上下判定はスキップします。")
+    mp = _mediapipe()
+    if mp is None:
         return 0, 0.0
 
-    pose = mp.solutions.pose.Pose(static_image_mode=True, enable_segmentation=False)
-    rgb = pil_img.convert("RGB")
+    pose = _get_pose()
+    rgb = _as_rgb(pil_img)
     height = rgb.size[1]
     results = pose.process(np.array(rgb))
 
@@ -78,17 +450,27 @@ def detect_pose_up_down(pil_img):
     hip_y = (landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP].y + landmarks[mp.solutions.pose.PoseLandmark.RIGHT_HIP].y) / 2 * height
 
     if nose_y > hip_y:
-        return 180, 10.0
-    return 0, 10.0
+        return 180, POSE_CONFIDENCE
+    return 0, POSE_CONFIDENCE
 
 
 def get_text_char_count(pil_img) -> int:
     """Return the number of characters found by Tesseract on the image."""
 
+    api = _get_text_api()
+    if api is not None:
+        _set_tesserocr_image(api, _as_rgb(pil_img))
+        try:
+            text = api.GetUTF8Text()
+        except RuntimeError:
+            return 0
+        # image_to_data の単語ごとの文字数の合計と同じく、空白以外の文字を数える
+        return sum(not ch.isspace() for ch in text)
+
     try:
         # Support both horizontal (jpn/eng) and vertical (jpn_vert) text detection
         data = pytesseract.image_to_data(
-            pil_img.convert("RGB"),
+            _as_rgb(pil_img),
             lang="jpn+jpn_vert+eng",
             output_type=pytesseract.Output.DICT
         )
@@ -104,39 +486,184 @@ def get_text_char_count(pil_img) -> int:
             count += len(text.strip())
     return count
 
-def has_text_content(pil_img) -> bool:
-    """Return True if Tesseract finds any text-like content on the image."""
-    return get_text_char_count(pil_img) > 0
+def has_text_content(osd_result: dict) -> bool:
+    """Return True if the OSD result shows any text-like content on the image.
+
+    OSD fails ("Too few characters") or reports no script confidence on pages
+    without text, so the already-computed OSD doubles as the text probe.
+    """
+    return osd_result.get("script_conf", 0.0) > 0
+
+
+def _rotation_distance(a: int, b: int) -> int:
+    return min((a - b) % 360, (b - a) % 360)
+
+
+def _snap_rotation_slow(rotation: int, allowed_rotations) -> int:
+    return min(allowed_rotations, key=lambda allowed: _rotation_distance(rotation % 360, allowed % 360))
+
+
+# ページごとに使う許容回転の組み合わせは固定なので、0-359 度の対応表を事前に作っておく
+_SNAP_TABLES = {
+    allowed: tuple(_snap_rotation_slow(degree, allowed) for degree in range(360))
+    for allowed in ((0, 180), (90, 270))
+}
 
 
 def snap_rotation_to_allowed(rotation: int, allowed_rotations: list[int]) -> int:
     """Pick the closest rotation within ``allowed_rotations``.
 
-    The distance is measured cyclically (e.g. 350 is close to 0).
+    The distance is measured cyclically (e.g. 350 is close to 0). The two
+    allowed sets used by :func:`analyze_page` are served from a lookup table.
     """
 
-    def _distance(a: int, b: int) -> int:
-        return min((a - b) % 360, (b - a) % 360)
+    table = _SNAP_TABLES.get(tuple(allowed_rotations))
+    if table is not None:
+        return table[rotation % 360]
+    return _snap_rotation_slow(rotation, allowed_rotations)
+
+
+# これ未満の文字数しか描画していないページは、埋め込みテキストから向きを決めずに OSD に回す
+EMBEDDED_TEXT_MIN_GLYPHS = 20
 
-    return min(allowed_rotations, key=lambda allowed: _distance(rotation % 360, allowed % 360))
+# 塗りも線も描かないテキスト描画モード（3: 不可視、7: クリップのみ）
+_INVISIBLE_RENDER_MODES = (3, 7)
+
+_TEXT_SHOW_OPERATORS = {"Tj", "TJ", "'", '"'}
+
+
+def _concat_linear(m1, m2):
+    """Multiply the linear parts ``(a, b, c, d)`` of two PDF matrices (m1 x m2)."""
+
+    a1, b1, c1, d1 = m1
+    a2, b2, c2, d2 = m2
+    return (a1 * a2 + b1 * c2, a1 * b2 + b1 * d2, c1 * a2 + d1 * c2, c1 * b2 + d1 * d2)
+
+
+def _font_code_length(fonts, font_name) -> int:
+    """Return the bytes per character code for a font in the page's ``/Font`` dict.
+
+    Composite (Type0) fonts are treated as 2-byte codes, which holds for the
+    Identity-H/V encodings used by practically all embedded CJK fonts; simple
+    fonts use 1 byte per code.
+    """
+
+    font = fonts.get(font_name) if fonts is not None else None
+    if font is not None and font.get("/Subtype") == "/Type0":
+        return 2
+    return 1
+
+
+def _shown_glyph_count(operator: str, operands, code_length: int = 1) -> int:
+    """Approximate the number of glyphs drawn by a text-showing operator."""
+
+    if operator == "TJ":
+        items = operands[0] if operands else []
+        shown = sum(len(bytes(item)) for item in items if isinstance(item, pikepdf.String))
+    elif operands and isinstance(operands[-1], pikepdf.String):
+        shown = len(bytes(operands[-1]))
+    else:
+        return 0
+    return shown // code_length
+
+
+def embedded_text_angles(page) -> dict[int, int]:
+    """Histogram of visible text direction on the page, weighted by glyph count.
+
+    Keys are the text baseline angles in user space rounded to 0/90/180/270
+    degrees (counter-clockwise), taken from the text matrix combined with the
+    CTM. Invisible text (render mode 3, as written by OCR software over a
+    scan, and clip-only mode 7) is ignored because it says nothing about how
+    the scanned image is oriented. Text inside form XObjects is not inspected.
+    """
+
+    resources = page.obj.get("/Resources")
+    if resources is None or "/Font" not in resources:
+        return {}
+
+    try:
+        instructions = pikepdf.parse_content_stream(page)
+    except pikepdf.PdfError:
+        return {}
+
+    identity = (1.0, 0.0, 0.0, 1.0)
+    ctm, text_matrix, render_mode, code_length = identity, identity, 0, 1
+    fonts = resources.get("/Font")
+    saved_states = []
+    angles = {}
+    for operands, operator in instructions:
+        op = str(operator)
+        # 数値であるべき位置に名前などが入った壊れた命令は、ビューアと同様にその命令だけ無視する
+        try:
+            if op == "q":
+                saved_states.append((ctm, render_mode, code_length))
+            elif op == "Q":
+                if saved_states:
+                    ctm, render_mode, code_length = saved_states.pop()
+            elif op == "cm" and len(operands) == 6:
+                ctm = _concat_linear(tuple(float(v) for v in operands[:4]), ctm)
+            elif op == "BT":
+                text_matrix = identity
+            elif op == "Tm" and len(operands) == 6:
+                text_matrix = tuple(float(v) for v in operands[:4])
+            elif op == "Tr" and operands:
+                render_mode = int(operands[0])
+            elif op == "Tf" and operands:
+                code_length = _font_code_length(fonts, operands[0])
+            elif op in _TEXT_SHOW_OPERATORS and render_mode not in _INVISIBLE_RENDER_MODES:
+                glyphs = _shown_glyph_count(op, operands, code_length)
+                if not glyphs:
+                    continue
+                a, b, _, _ = _concat_linear(text_matrix, ctm)
+                angle = round(math.degrees(math.atan2(b, a)) / 90) * 90 % 360
+                angles[angle] = angles.get(angle, 0) + glyphs
+        except (TypeError, ValueError):
+            continue
+    return angles
+
+
+def embedded_text_rotation(page):
+    """Return the ``/Rotate`` value that displays the page's text upright, or ``None``.
+
+    Text at angle ``θ`` in user space is upright once the page is rotated
+    clockwise by ``θ``, so the dominant text angle is the answer. Pages with
+    fewer than ``EMBEDDED_TEXT_MIN_GLYPHS`` visible glyphs are left to OSD.
+    """
+
+    angles = embedded_text_angles(page)
+    if sum(angles.values()) < EMBEDDED_TEXT_MIN_GLYPHS:
+        return None
+    return max(angles, key=angles.get)
 
 
 def determine_output_path(inp: Path) -> Path:
     """Return output path with ``_rot`` suffix in the same directory.
 
     If a file with that name already exists, append a sequential index
-    (``_1``, ``_2``, ...) to avoid overwriting existing outputs.
+    (``_1``, ``_2``, ...) to avoid overwriting existing outputs. When all
+    indices are taken, a timestamp suffix is used instead.
     """
 
+    # ディレクトリを 1 回だけ列挙して既存名を集める（候補ごとの exists() 呼び出しを避ける）。
+    # Windows の大文字小文字を区別しないファイル名でも上書きしないよう casefold で比較する
+    existing = {name.casefold() for name in os.listdir(inp.parent)}
+
+    def _is_free(candidate: Path) -> bool:
+        return candidate.name.casefold() not in existing
+
     base = inp.with_name(f"{inp.stem}_rot{inp.suffix}")
-    if not base.exists():
+    if _is_free(base):
         return base
 
     for idx in range(1, 1_000):
         candidate = inp.with_name(f"{inp.stem}_rot_{idx}{inp.suffix}")
-        if not candidate.exists():
+        if _is_free(candidate):
             return candidate
 
+    candidate = inp.with_name(f"{inp.stem}_rot_{datetime.now():%Y%m%d_%H%M%S}{inp.suffix}")
+    if _is_free(candidate) and not candidate.exists():
+        return candidate
+
     raise FileExistsError("適切な出力ファイル名を決定できませんでした。既存の rot ファイルを整理してください。")
 
 
@@ -154,7 +681,16 @@ def save_pdf(pdf: pikepdf.Pdf, out: Path) -> Path:
                 raise PermissionError(
                     f"出力ファイル {path} を上書きできません。閲覧アプリを閉じて再実行してください。"
                 )
-        pdf.save(str(path))
+        # 回転以外は変更していないため、既存のストリームを再圧縮・再構成せずそのまま書き出す
+        pdf.save(
+            str(path),
+            linearize=False,
+            object_stream_mode=pikepdf.ObjectStreamMode.preserve,
+            stream_decode_level=pikepdf.StreamDecodeLevel.none,
+            recompress_flate=False,
+            compress_streams=False,
+            fix_metadata_version=False,
+        )
 
     try:
         _try_save(out)
@@ -185,138 +721,432 @@ def prompt_numeric_value(name: str, default, caster):
         return default
 
 
-def process_file(inp: Path) -> None:
-    out = determine_output_path(inp)
+def _init_worker(conf_threshold: float, dpi: int, osd_dpi: int, osd_max_side: int) -> None:
+    """Initializer for OCR worker processes.
+
+    Runtime settings entered at the prompt are passed explicitly because
+    spawned workers (the default on Windows) re-import this module and would
+    otherwise see only the defaults.
+    """
 
-    images = convert_from_path(str(inp), dpi=DPI)
-    pdf = pikepdf.open(str(inp))
+    global CONF_THRESHOLD, DPI, OSD_DPI, OSD_MAX_SIDE
 
-    low = []
-    changed = 0
-    high_conf_updown_rots = []
+    CONF_THRESHOLD = conf_threshold
+    DPI = dpi
+    OSD_DPI = osd_dpi
+    OSD_MAX_SIDE = osd_max_side
+    load_osd_cache()
 
-    for i, (img, page) in enumerate(zip(images, pdf.pages), start=1):
-        current_rotation = int(page.obj.get("/Rotate", 0))
 
-        # --- Step 1: rotate landscape pages into portrait (90 or 270) ---
-        is_portrait = img.height >= img.width
-        primary_rot = 0
-        primary_conf = 10.0 if is_portrait else 0.0
+def analyze_page(img, load_text_image=None):
+    """Run the orientation probes for a single page image.
 
-        if not is_portrait:
-            rot_landscape, conf_landscape = detect_rotation_osd(img)
-            primary_rot = snap_rotation_to_allowed(rot_landscape, [90, 270])
-            primary_conf = conf_landscape
+    ``img`` only needs the resolution orientation detection needs
+    (``OSD_DPI``). ``load_text_image`` optionally returns the same page at
+    ``DPI`` for the character count; it is called only when that count
+    decides the result.
 
-        portrait_img = img.rotate(-primary_rot, expand=True) if primary_rot else img
+    Returns ``(is_portrait, primary_rot, primary_conf, rot, conf, portrait_osd)``
+    where ``portrait_osd`` is the raw OSD ``(rot, conf)`` of the portrait image
+    so the double-check can reuse it. The page is not touched, so this can run
+    in a worker process.
+    """
+
+    # --- Step 1: rotate landscape pages into portrait (90 or 270) ---
+    is_portrait = img.height >= img.width
+    primary_rot = 0
+    primary_conf = 10.0 if is_portrait else 0.0
 
-        # --- Step 2: decide upright vs upside-down (0 or 180) ---
-        used_fallback = False
-        rot, conf = 0, 0.0
+    if not is_portrait:
+        rot_landscape, conf_landscape = detect_rotation_osd(img)
+        primary_rot = snap_rotation_to_allowed(rot_landscape, [90, 270])
+        primary_conf = conf_landscape
 
-        # Count characters to decide strategy
-        char_count = get_text_char_count(portrait_img)
-        has_text = char_count > 0
+    portrait_img = img.rotate(-primary_rot, expand=True) if primary_rot else img
 
-        # Define threshold for "few characters" (e.g. less than 50 chars might be an illustration with a caption)
-        FEW_CHARS_THRESHOLD = 50
+    # --- Step 2: decide upright vs upside-down (0 or 180) ---
+    rot, conf = 0, 0.0
 
-        if has_text:
-            rot, conf = detect_rotation_osd(portrait_img)
+    # OSD の結果そのものでテキストの有無を判定する（文字が無ければ OSD は失敗する）
+    osd = run_osd(portrait_img)
+    portrait_osd = rotation_from_osd(osd)
+    has_text = has_text_content(osd)
 
-        if conf < CONF_THRESHOLD or char_count < FEW_CHARS_THRESHOLD:
-            # OSDの信頼度が低い場合、または文字数が少ない場合は姿勢推定を試す
-            # テキストが十分にあり、かつOSD信頼度が極端に低くない(>=0.5)場合はOSDを優先
-            # 文字数が少ない場合は、OSD信頼度が高くても姿勢判定と併用検討したいが、
-            # ここでは「文字数が少ない」＝「画像主体の可能性が高い」として姿勢判定を許容する
+    # Define threshold for "few characters" (e.g. less than 50 chars might be an illustration with a caption)
+    FEW_CHARS_THRESHOLD = 50
 
-            run_pose = True
-            if has_text and char_count >= FEW_CHARS_THRESHOLD and conf >= 0.5:
-                # テキストが十分あり、信頼度もそこそこあれば、姿勢判定はスキップ(OSD優先)
-                run_pose = False
+    if has_text:
+        rot, conf = portrait_osd
 
-            if run_pose:
-                p_rot, p_conf = detect_pose_up_down(portrait_img)
-                if p_conf > conf:
-                    rot = p_rot
-                    conf = p_conf
+    # 文字数カウント(image_to_data)は重いため、判定結果を左右する場合にだけ実行する
+    char_count = None
 
-        allowed_updown = [0, 180]
-        if conf < CONF_THRESHOLD and high_conf_updown_rots:
-            applied_updown = Counter(high_conf_updown_rots).most_common(1)[0][0]
-            used_fallback = True
+    def _has_few_chars() -> bool:
+        nonlocal char_count
+        if char_count is None:
+            if load_text_image is None:
+                char_count = get_text_char_count(portrait_img)
+            else:
+                # 文字認識には向き判定より高い解像度が必要なので、そのページだけ DPI で描画し直す。
+                # 高解像度画像は数えたらすぐに解放する
+                with load_text_image() as page_img:
+                    text_img = page_img.rotate(-primary_rot, expand=True) if primary_rot else page_img
+                    char_count = get_text_char_count(text_img)
+        return char_count < FEW_CHARS_THRESHOLD
+
+    # 文字数が効くのは姿勢推定を行うかどうかだけなので、姿勢推定が使えない環境や、
+    # 姿勢推定の結果が OSD に勝てない（OSD の信頼度が POSE_CONFIDENCE 以上の）ページでは数えない
+    pose_can_win = conf < POSE_CONFIDENCE and _mediapipe() is not None
+
+    if pose_can_win and (conf < CONF_THRESHOLD or _has_few_chars()):
+        # OSDの信頼度が低い場合、または文字数が少ない場合は姿勢推定を試す
+        # テキストが十分にあり、かつOSD信頼度が極端に低くない(>=0.5)場合はOSDを優先
+        # 文字数が少ない場合は、OSD信頼度が高くても姿勢判定と併用検討したいが、
+        # ここでは「文字数が少ない」＝「画像主体の可能性が高い」として姿勢判定を許容する
+
+        run_pose = True
+        if has_text and conf >= 0.5 and not _has_few_chars():
+            # テキストが十分あり、信頼度もそこそこあれば、姿勢判定はスキップ(OSD優先)
+            run_pose = False
+
+        if run_pose:
+            p_rot, p_conf = detect_pose_up_down(portrait_img)
+            if p_conf > conf:
+                rot = p_rot
+                conf = p_conf
+
+    return is_portrait, primary_rot, primary_conf, rot, conf, portrait_osd
+
+
+def double_check_updown(portrait_img, applied_updown: int, portrait_osd=None):
+    """Score the page as-is against the page rotated by ``applied_updown``.
+
+    ``portrait_osd`` is the OSD result already computed for ``portrait_img``
+    by :func:`analyze_page`; it is only recomputed when missing. When that
+    result is confident, the rotated image is not re-rendered or re-OCR'd.
+
+    Returns ``(score_original, score_rotated)``; the caller reverts the
+    rotation when the original scores higher.
+    """
+
+    # 元画像(0度)と回転後画像(180度)でOSDを行い、どちらが「0度(正立)」と判定されるか、かつその信頼度を比較する
+    # 1. 元画像の正立度合い
+    # 注意: rot は姿勢判定によって上書きされている可能性があるため、姿勢判定前の OSD 結果を使う。
+    # Step 2 で OSD を実行していない場合のみ、ここで元画像に対して OSD を実行する。
+    if portrait_osd is None:
+        portrait_osd = detect_rotation_osd(portrait_img)
+    check_rot, check_conf = portrait_osd
+    score_original = check_conf if check_rot == 0 else 0.0
+
+    # 2. 回転後画像の正立度合い
+    if check_conf >= CONF_THRESHOLD:
+        # 元画像の OSD が十分信頼できるなら、回転後の OSD は同じ判定を裏返すだけなので再計算しない
+        score_rotated = check_conf if (check_rot - applied_updown) % 360 == 0 else 0.0
+    else:
+        if applied_updown == 180:
+            # 180度回転は画素の並べ替えだけで済む transpose を使う（補間・再サンプリング不要）
+            rotated_img = portrait_img.transpose(Image.ROTATE_180)
         else:
-            applied_updown = snap_rotation_to_allowed(rot, allowed_updown)
+            rotated_img = portrait_img.rotate(applied_updown, expand=True)
+        r_rot, r_conf = detect_rotation_osd(rotated_img)
+        score_rotated = r_conf if r_rot == 0 else 0.0
+
+    # 文字情報による判定が不可能な場合（両方の信頼度が低い場合）、画像情報（姿勢推定）で再判定
+    # 例: 両方とも信頼度が 1.0 未満など、明確な判断ができていない場合
+    OSD_CHECK_THRESHOLD = 1.0
+    if score_original < OSD_CHECK_THRESHOLD and score_rotated < OSD_CHECK_THRESHOLD:
+        # 姿勢判定を実施
+        p_rot, p_conf = detect_pose_up_down(portrait_img)
+        # 姿勢推定で「0度（正立）」と出た場合、originalスコアを上書き
+        if p_rot == 0:
+            score_original = p_conf
+        # 「180度（倒立）」と出た場合、rotatedスコア（＝回転させた状態が正立）を上書き
+        elif p_rot == 180:
+            score_rotated = p_conf
+
+    return score_original, score_rotated
+
+
+def render_page(pdf_path: str, page_number: int, dpi: int):
+    """Rasterize a single page of ``pdf_path`` into memory."""
+
+    return convert_from_path(
+        pdf_path,
+        dpi=dpi,
+        first_page=page_number,
+        last_page=page_number,
+        fmt="jpeg",
+        jpegopt=RASTER_JPEG_OPTIONS,
+    )[0]
+
+
+def rasterize_page(pdf_path: str, page_number: int, output_folder: str) -> str:
+    """Rasterize a single page at ``OSD_DPI`` into ``output_folder`` and return its path."""
+
+    return convert_from_path(
+        pdf_path,
+        dpi=OSD_DPI,
+        first_page=page_number,
+        last_page=page_number,
+        output_folder=output_folder,
+        paths_only=True,
+        thread_count=1,
+        fmt="jpeg",
+        jpegopt=RASTER_JPEG_OPTIONS,
+    )[0]
+
+
+def _analyze_page_file(pdf_path: str, page_number: int, output_folder: str):
+    """Worker entry point: rasterize one page into ``output_folder`` and analyze it.
+
+    The page is rendered at ``OSD_DPI``; when the character count is needed
+    it is re-rendered at ``DPI`` (unless that is not higher). Returns the
+    analysis, the image path (for the double check), the new OSD cache
+    entries and the OSD failure reasons.
+    """
 
-        if conf >= CONF_THRESHOLD:
-            high_conf_updown_rots.append(applied_updown)
+    image_path = rasterize_page(pdf_path, page_number, output_folder)
 
-        # 縦長ページかつ回転操作(180度)が加わる場合、ダブルチェックを行う
-        # 元画像(0度)と回転後画像(180度)でOSDを行い、どちらが「0度(正立)」と判定されるか、かつその信頼度を比較する
-        if is_portrait and applied_updown != 0:
-            # 1. 元画像の正立度合い
-            # 注意: rot は姿勢判定によって上書きされている可能性があるため、ここで再度OSDを行うか、
-            # OSDの結果を確実に利用する。ここでは安全のため元画像に対してOSDを実行する。
-            check_rot, check_conf = detect_rotation_osd(portrait_img)
-            score_original = check_conf if check_rot == 0 else 0.0
+    load_text_image = None
+    if DPI > OSD_DPI:
+        load_text_image = partial(render_page, pdf_path, page_number, DPI)
 
-            # 2. 回転後画像の正立度合い
-            rotated_img = portrait_img.rotate(applied_updown, expand=True)
-            r_rot, r_conf = detect_rotation_osd(rotated_img)
-            score_rotated = r_conf if r_rot == 0 else 0.0
-
-            # 文字情報による判定が不可能な場合（両方の信頼度が低い場合）、画像情報（姿勢推定）で再判定
-            # 例: 両方とも信頼度が 1.0 未満など、明確な判断ができていない場合
-            OSD_CHECK_THRESHOLD = 1.0
-            if score_original < OSD_CHECK_THRESHOLD and score_rotated < OSD_CHECK_THRESHOLD:
-                # 姿勢判定を実施
-                p_rot, p_conf = detect_pose_up_down(portrait_img)
-                # 姿勢推定で「0度（正立）」と出た場合、originalスコアを上書き
-                if p_rot == 0:
-                    score_original = p_conf
-                # 「180度（倒立）」と出た場合、rotatedスコア（＝回転させた状態が正立）を上書き
-                elif p_rot == 180:
-                    score_rotated = p_conf
-
-            # 元の方が「正立している」信頼度が高いなら、回転を取り消す
-            if score_original > score_rotated:
-                print(f"  [DoubleCheck] page {i}: Reverting 180 rotation. Score Orig({score_original}) > Rot({score_rotated})")
-                applied_updown = 0
-                total_rotation = (primary_rot + applied_updown) % 360 # Update if needed, though primary is 0 here
-            else:
-                 # 回転後の方が良い、あるいはどっちもダメなら当初の判定(Poseなど)を優先
-                 pass
+    with Image.open(image_path) as img:
+        analysis = analyze_page(img, load_text_image)
+    return analysis, image_path, _drain_new_osd_cache(), _drain_osd_failures()
 
-        total_rotation = (primary_rot + applied_updown) % 360
-        new_rotation = (current_rotation + total_rotation) % 360
 
-        if new_rotation != current_rotation:
-            page.Rotate = new_rotation
-            changed += 1
+def _double_check_updown_file(image_path: str, applied_updown: int, portrait_osd=None):
+    """Worker entry point for :func:`double_check_updown` on a rasterized page.
 
-        if conf < CONF_THRESHOLD or primary_conf < CONF_THRESHOLD:
-            low.append((i, primary_rot, applied_updown, conf, used_fallback, total_rotation))
+    Returns the scores together with the new OSD cache entries and the OSD
+    failure reasons.
+    """
 
-    out = save_pdf(pdf, out)
+    with Image.open(image_path) as img:
+        scores = double_check_updown(img, applied_updown, portrait_osd)
+    return scores, _drain_new_osd_cache(), _drain_osd_failures()
 
-    print(f"Saved: {out}  changed_pages={changed}")
-    if low:
-        print("Low-confidence pages (please verify):")
-        for p, primary, updown, c, used_fallback, total in low:
-            suffix = " (fallback used)" if used_fallback else ""
-            print(f"  page {p}: total_rot={total} (portrait_fix={primary}, updown={updown}), conf={c}{suffix}")
 
+def _osd_failure_lines(page_number: int, failures: list) -> list:
+    """Format the OSD failure reasons reported for one page."""
 
-if __name__ == "__main__":
-    import sys
+    return [
+        f"  page {page_number}: Tesseract OSD failed ({reason}); using default rotation=0, conf=0"
+        for reason in failures
+    ]
+
+
+def decide_updown(snapped_updown, conf, analyzed):
+    """Apply the majority fallback to every page's up/down decision at once.
+
+    ``snapped_updown`` holds each page's own 0/180 decision, ``conf`` its
+    confidence and ``analyzed`` masks out pages that were not OCR'd. A
+    low-confidence page takes the most common decision among the
+    high-confidence pages before it (ties go to the value seen first), as the
+    former running ``Counter`` did, but in O(pages).
+
+    Returns ``(applied_updown, used_fallback)`` arrays.
+    """
+
+    high = analyzed & (conf >= CONF_THRESHOLD)
+    flips = high & (snapped_updown == 180)
+    uprights = high & (snapped_updown == 0)
+
+    # 各ページより前にある高信頼度ページの件数（自ページは含めない）
+    flips_before = np.cumsum(flips) - flips
+    uprights_before = np.cumsum(uprights) - uprights
+
+    first_high = snapped_updown[np.argmax(high)] if high.any() else 0
+    majority = np.where(
+        flips_before > uprights_before,
+        180,
+        np.where(uprights_before > flips_before, 0, first_high),
+    )
+
+    used_fallback = analyzed & (conf < CONF_THRESHOLD) & (flips_before + uprights_before > 0)
+    applied_updown = np.where(used_fallback, majority, snapped_updown).astype(np.int16)
+    return applied_updown, used_fallback
+
+
+def _worker_settings():
+    return CONF_THRESHOLD, DPI, OSD_DPI, OSD_MAX_SIDE
+
+
+@contextmanager
+def _ocr_map(workers: int):
+    """Yield a ``map``-like callable that runs on ``workers`` processes.
 
+    With a single worker the work runs inline, which is what a file-level
+    worker uses so that processes are not nested.
+    """
+
+    if workers <= 1:
+        yield map
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=_worker_settings(),
+    ) as executor:
+        # 1 ページの処理は数秒かかるため、まとめて渡さず 1 ページずつ空いたワーカーに配る
+        # （まとめると少ページの PDF やダブルチェックが 1 つのワーカーに偏る）
+        yield partial(executor.map, chunksize=1)
+
+
+def process_file(inp: Path, workers: int = OCR_WORKERS) -> None:
+    out = determine_output_path(inp)
+
+    # 十分な埋め込みテキストを持つページは文字の向きから /Rotate を決め、ラスタライズも OCR も行わない
+    with pikepdf.open(str(inp)) as src:
+        page_count = len(src.pages)
+        text_rotation = np.full(page_count, -1, dtype=np.int16)
+        current_rotation = np.zeros(page_count, dtype=np.int16)
+        for idx, page in enumerate(src.pages):
+            current_rotation[idx] = int(page.obj.get("/Rotate", 0)) % 360
+            page_rotation = embedded_text_rotation(page)
+            if page_rotation is not None:
+                text_rotation[idx] = page_rotation
+    ocr_pages = (np.flatnonzero(text_rotation < 0) + 1).tolist()
+
+    load_osd_cache()
+    new_osd_entries = {}
+    # 進捗・結果のメッセージはためておき、最後に 1 回で書き出す
+    report = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # ラスタライズは各ワーカーが担当ページの分だけ行い、一時フォルダに書き出す
+        # （OCR とラスタライズが並行して進み、全ページの画像がメモリに載ることもない）
+        page_paths = {}
+
+        # ページごとの判定結果はページ数分の配列で持つ（OCR を省略したページは analyzed=False）
+        analyzed = np.zeros(page_count, dtype=bool)
+        is_portrait = np.zeros(page_count, dtype=bool)
+        primary_rot = np.zeros(page_count, dtype=np.int16)
+        primary_conf = np.zeros(page_count)
+        rot = np.zeros(page_count, dtype=np.int16)
+        conf = np.zeros(page_count)
+        portrait_osds = [None] * page_count
+
+        # ページ数より多いワーカーは起動しない（OCR 対象が 1 ページ以下なら親プロセスで処理する）
+        with _ocr_map(min(workers, len(ocr_pages))) as ocr_map:
+            # OCR はページごとに独立しているため、まとめてワーカープロセスに投げる
+            analyses = ocr_map(_analyze_page_file, repeat(str(inp)), ocr_pages, repeat(tmpdir))
+            for i, (analysis, image_path, osd_entries, failures) in zip(ocr_pages, analyses):
+                new_osd_entries.update(osd_entries)
+                report += _osd_failure_lines(i, failures)
+                page_paths[i] = image_path
+                idx = i - 1
+                analyzed[idx] = True
+                is_portrait[idx], primary_rot[idx], primary_conf[idx], rot[idx], conf[idx], portrait_osds[idx] = analysis
+
+            # 低信頼度ページの多数決フォールバックは OCR がすべて終わってからまとめて決める
+            snapped_updown = np.asarray(_SNAP_TABLES[(0, 180)], dtype=np.int16)[rot % 360]
+            applied_updown, used_fallback = decide_updown(snapped_updown, conf, analyzed)
+
+            # 縦長ページかつ回転操作(180度)が加わる場合、ダブルチェックを行う
+            check_indices = np.flatnonzero(analyzed & is_portrait & (applied_updown != 0)).tolist()
+            check_results = ocr_map(
+                _double_check_updown_file,
+                [page_paths[idx + 1] for idx in check_indices],
+                [int(applied_updown[idx]) for idx in check_indices],
+                [portrait_osds[idx] for idx in check_indices],
+            )
+            check_scores = {}
+            for idx, (scores, osd_entries, failures) in zip(check_indices, check_results):
+                new_osd_entries.update(osd_entries)
+                report += _osd_failure_lines(idx + 1, failures)
+                check_scores[idx] = scores
+
+    save_osd_cache(new_osd_entries)
+
+    # 回転の判定をすべて済ませてから、変更するページだけをまとめて書き換える
+    rotations: dict[int, int] = {}
+    for idx in range(page_count):
+        if text_rotation[idx] >= 0:
+            new_rotation = int(text_rotation[idx])
+        elif analyzed[idx]:
+            if idx in check_scores:
+                score_original, score_rotated = check_scores[idx]
+                # 元の方が「正立している」信頼度が高いなら、回転を取り消す
+                if score_original > score_rotated:
+                    report.append(f"  [DoubleCheck] page {idx + 1}: Reverting 180 rotation. Score Orig({score_original}) > Rot({score_rotated})")
+                    applied_updown[idx] = 0
+                else:
+                     # 回転後の方が良い、あるいはどっちもダメなら当初の判定(Poseなど)を優先
+                     pass
+
+            total_rotation = int(primary_rot[idx] + applied_updown[idx]) % 360
+            new_rotation = (int(current_rotation[idx]) + total_rotation) % 360
+        else:
+            continue
+
+        if new_rotation != current_rotation[idx]:
+            rotations[idx] = new_rotation
+
+    total_rotations = (primary_rot + applied_updown) % 360
+    low = np.flatnonzero(analyzed & ((conf < CONF_THRESHOLD) | (primary_conf < CONF_THRESHOLD)))
+
+    # 向きがすべて正しければ入力のコピーになるだけなので、開き直しも書き出しもしない
+    if rotations:
+        # pikepdf のページ操作は親プロセスでのみ行う
+        with pikepdf.open(str(inp)) as pdf:
+            for idx, new_rotation in rotations.items():
+                pdf.pages[idx].Rotate = new_rotation
+            out = save_pdf(pdf, out)
+        report.append(f"Saved: {out}  changed_pages={len(rotations)}  text_pages={page_count - len(ocr_pages)}")
+    else:
+        report.append(f"No rotation needed: {inp}  (not written)  text_pages={page_count - len(ocr_pages)}")
+    if low.size:
+        report.append("Low-confidence pages (please verify):")
+        for idx in low:
+            suffix = " (fallback used)" if used_fallback[idx] else ""
+            report.append(
+                f"  page {idx + 1}: total_rot={total_rotations[idx]} "
+                f"(portrait_fix={primary_rot[idx]}, updown={applied_updown[idx]}), conf={conf[idx]}{suffix}"
+            )
+    sys.stdout.write("\n".join(report) + "\n")
+
+
+def _page_count(path: Path) -> int:
+    try:
+        with pikepdf.open(str(path)) as pdf:
+            return len(pdf.pages)
+    except (pikepdf.PdfError, OSError):
+        # 開けないファイルはここでは数えず、process_file でエラーとして報告させる
+        return 0
+
+
+def use_file_parallelism(input_paths: list[Path]) -> bool:
+    """Return True to run files in parallel (pages serially), False for per-page workers.
+
+    File-level workers only win when there are enough files to occupy every
+    worker, or when no file has more pages than there are files; otherwise
+    (e.g. two 300-page PDFs) per-page parallelism keeps all workers busy.
+    """
+
+    if len(input_paths) < 2 or OCR_WORKERS < 2:
+        return False
+    if len(input_paths) >= OCR_WORKERS:
+        return True
+    return max(_page_count(path) for path in input_paths) <= len(input_paths)
+
+
+if __name__ == "__main__":
     CONF_THRESHOLD = prompt_numeric_value("CONF_THRESHOLD", DEFAULT_CONF_THRESHOLD, float)
     DPI = prompt_numeric_value("DPI", DEFAULT_DPI, int)
+    OSD_DPI = prompt_numeric_value("OSD_DPI", DEFAULT_OSD_DPI, int)
+    OSD_MAX_SIDE = prompt_numeric_value("OSD_MAX_SIDE", DEFAULT_OSD_MAX_SIDE, int)
 
     # コマンドライン引数があれば従来通り使う。なければファイルダイアログで選択。
     if len(sys.argv) >= 2:
         input_files = sys.argv[1:]
     else:
+        # Tk の読み込みはダイアログを表示するときだけ行う（CLI 実行やワーカープロセスでは不要）
+        import tkinter as tk
+        from tkinter import filedialog
+
         root = tk.Tk()
         root.withdraw()
         selected_files = filedialog.askopenfilenames(
@@ -329,5 +1159,15 @@ if __name__ == "__main__":
             print("入力ファイルが選択されなかったため終了します。")
             raise SystemExit(1)
 
-    for input_file in input_files:
-        process_file(Path(input_file))
+    input_paths = [Path(input_file) for input_file in input_files]
+    if use_file_parallelism(input_paths):
+        # ファイル単位で並列化し、各ファイル内のページは直列に処理する（過剰な並列化を避ける）
+        with ProcessPoolExecutor(
+            max_workers=min(OCR_WORKERS, len(input_paths)),
+            initializer=_init_worker,
+            initargs=_worker_settings(),
+        ) as executor:
+            list(executor.map(partial(process_file, workers=1), input_paths))
+    else:
+        for input_path in input_paths:
+            process_file(input_path)